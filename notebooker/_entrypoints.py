@@ -180,8 +180,9 @@ def start_webapp(
 @click.option("--n-retries", default=3, help="The number of times to retry when executing this notebook.")
 @click.option(
     "--job-id",
-    default=str(uuid.uuid4()),
-    help="The unique job ID for this notebook. Can be non-unique, but note that you will overwrite history.",
+    default=None,
+    help="The unique job ID for this notebook. Can be non-unique, but note that you will overwrite history. "
+    "If not passed, one will be generated.",
 )
 @click.option("--mailto", default="", help="A comma-separated list of email addresses which will receive results.")
 @click.option(
@@ -207,6 +208,14 @@ def start_webapp(
     default=None,
     help="Use this email in the From header of any sent email. If not passed, --default-mailfrom will be used",
 )
+@click.option(
+    "--ready-fd",
+    default=None,
+    type=int,
+    hidden=True,
+    help="Internal use. A file descriptor to which we write once the report has set up its directories and "
+    "connected to its result serializer.",
+)
 @pass_config
 def execute_notebook(
     config: BaseConfig,
@@ -224,6 +233,7 @@ def execute_notebook(
     prepare_notebook_only,
     scheduler_job_id,
     mailfrom,
+    ready_fd,
 ):
     if report_name is None:
         raise ValueError("Error! Please provide a --report-name.")
@@ -243,6 +253,7 @@ def execute_notebook(
         prepare_notebook_only,
         scheduler_job_id,
         mailfrom,
+        ready_fd=ready_fd,
     )
 
 
@@ -156,7 +156,7 @@ def run_report(
     mailfrom=None,
 ):
 
-    job_id = job_id or str(uuid.uuid4())
+    job_id = job_id or uuid.uuid4().hex
     stop_execution = os.getenv("NOTEBOOKER_APP_STOPPING")
     if stop_execution:
         logger.info("Aborting attempt to run %s, jobid=%s as app is shutting down.", report_name, job_id)
@@ -327,6 +327,7 @@ def execute_notebook_entrypoint(
     prepare_notebook_only: bool,
     scheduler_job_id: Optional[str],
     mailfrom: Optional[str],
+    ready_fd: Optional[int] = None,
 ):
     report_title = report_title or report_name
     output_dir, template_dir, _ = initialise_base_dirs(output_dir=config.OUTPUT_DIR, template_dir=config.TEMPLATE_DIR)
@@ -361,6 +362,10 @@ def execute_notebook_entrypoint(
 
     logger.info("Calculated overrides are: %s", str(all_overrides))
     result_serializer = get_serializer_from_cls(config.SERIALIZER_CLS, **config.SERIALIZER_CONFIG)
+    if ready_fd is not None:
+        # Everything which is likely to fail on bad arguments or config has now run, so tell our parent we've started.
+        os.write(ready_fd, b"1")
+        os.close(ready_fd)
     results = []
     for overrides in all_overrides:
         result = run_report(
@@ -1,11 +1,20 @@
-import errno
+import hashlib
+import json
 import os
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 from logging import getLogger
 
 from notebooker.serialization.serialization import get_serializer_from_cls
 from notebooker.utils.results import get_latest_successful_job_results_all_params
 
 logger = getLogger(__name__)
+# Writing a snapshot is dominated by file-system latency, so results are written by a pool of threads.
+SNAPSHOT_MAX_WORKERS = min(32, (os.cpu_count() or 1) * 4)
+# Each write holds on to its (possibly large) result, so only read results from the serializer as quickly as they
+# can be written.
+SNAPSHOT_MAX_IN_FLIGHT = 2 * SNAPSHOT_MAX_WORKERS
+SNAPSHOT_WRITE_CHUNK_SIZE = 1 << 20
+SNAPSHOT_MANIFEST_NAME = "manifest.json"
 
 
 def snap_latest_successful_notebooks(config, report_name):
@@ -17,33 +26,91 @@ def snap_latest_successful_notebooks(config, report_name):
 
 
 def _write_results(results, directory):
-    for result in results:
-        _write_notebook_html(result, directory)
-        _write_notebook_outputs(result, directory)
+    created_dirs = set()
+    manifest = {}
+    with ThreadPoolExecutor(max_workers=SNAPSHOT_MAX_WORKERS) as executor:
+        in_flight = set()
+        for result in results:
+            html_path = _notebook_html_path(result, directory)
+            manifest[os.path.basename(html_path)] = result.overrides
+            # Create the directories before handing over to the writer threads, so that they don't race to do so.
+            _create_dirs_if_not_present(html_path, created_dirs)
+            for path in result.raw_html_resources["outputs"]:
+                _create_dirs_if_not_present(os.path.join(directory, path), created_dirs)
+            in_flight.add(executor.submit(_write_notebook_html, result, directory, created_dirs))
+            in_flight.add(executor.submit(_write_notebook_outputs, result, directory, created_dirs))
+            while len(in_flight) >= SNAPSHOT_MAX_IN_FLIGHT:
+                done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    future.result()
+        for future in in_flight:
+            future.result()
+    if manifest:
+        _write_manifest(manifest, directory)
 
 
-def _write_notebook_outputs(result, directory):
+def _write_manifest(manifest, directory):
+    # The html file names are hashes, so record which overrides each of them was run with.
+    manifest_path = os.path.join(directory, SNAPSHOT_MANIFEST_NAME)
+    logger.info("Writing snapshot manifest to {}".format(manifest_path))
+    _write_text(manifest_path, json.dumps(manifest, sort_keys=True, indent=2, default=str))
+
+
+def _write_notebook_outputs(result, directory, created_dirs=None):
+    created_dirs = set() if created_dirs is None else created_dirs
     for path, output in result.raw_html_resources["outputs"].items():
         output_path = os.path.join(directory, path)
-        _create_dirs_if_not_present(output_path)
+        _create_dirs_if_not_present(output_path, created_dirs)
         logger.info("Writing resources to {}".format(output_path))
-        with open(output_path, "wb") as output_file:
-            output_file.write(output)
+        _write_bytes(output_path, output)
+
+
+def _write_bytes(path, data):
+    # Each resource is written in one go, so skip the overhead of a buffered file object.
+    if isinstance(data, str):
+        data = data.encode("utf-8")
+    fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC | getattr(os, "O_BINARY", 0), 0o644)
+    try:
+        view = memoryview(data)
+        while view:
+            view = view[os.write(fd, view) :]
+    finally:
+        os.close(fd)
+
 
+def _overrides_key(overrides):
+    # A fixed-length name made of safe characters, however many overrides there are and whatever they contain.
+    overrides_json = json.dumps(overrides, sort_keys=True, default=str)
+    return hashlib.blake2b(overrides_json.encode("utf-8"), digest_size=8).hexdigest()
 
-def _write_notebook_html(result, directory):
-    override_str = "".join(["{}_{}".format(x, y) for x, y in result.overrides.items()])
-    save_file_name = "{}.html".format(override_str)
-    save_file_path = os.path.join(directory, save_file_name)
+
+def _notebook_html_path(result, directory):
+    save_file_name = "{}.html".format(_overrides_key(result.overrides))
+    return os.path.join(directory, save_file_name)
+
+
+def _write_notebook_html(result, directory, created_dirs=None):
+    created_dirs = set() if created_dirs is None else created_dirs
+    save_file_path = _notebook_html_path(result, directory)
     logger.info("Writing notebook result to {}".format(save_file_path))
-    _create_dirs_if_not_present(save_file_path)
-    with open(save_file_path, "w") as save_file:
-        save_file.write(result.raw_html)
+    _create_dirs_if_not_present(save_file_path, created_dirs)
+    _write_text(save_file_path, result.raw_html)
 
 
-def _create_dirs_if_not_present(filename):
-    try:
-        os.makedirs(os.path.dirname(filename))
-    except OSError as exc:
-        if exc.errno != errno.EEXIST:
-            raise
+def _write_text(path, text):
+    # Encode in chunks rather than all at once, so that we never hold a second full-size copy of large HTML in memory.
+    with open(path, "wb", buffering=SNAPSHOT_WRITE_CHUNK_SIZE) as save_file:
+        if isinstance(text, bytes):
+            save_file.write(text)
+            return
+        for start in range(0, len(text), SNAPSHOT_WRITE_CHUNK_SIZE):
+            save_file.write(text[start : start + SNAPSHOT_WRITE_CHUNK_SIZE].encode("utf-8"))
+
+
+def _create_dirs_if_not_present(filename, created_dirs):
+    # created_dirs is shared across a whole snapshot so that each directory is only created once.
+    dirname = os.path.dirname(filename)
+    if dirname in created_dirs:
+        return
+    os.makedirs(dirname, exist_ok=True)
+    created_dirs.add(dirname)
@@ -30,6 +30,14 @@ def set_cache(key, value, timeout=15, cache_dir=None):
     cache.set(str(key), value, timeout=timeout)
 
 
+@retrying.retry(stop_max_attempt_number=3)
+def delete_cache(key, cache_dir=None):
+    global cache
+    if cache is None:
+        cache = FileSystemCache(cache_dir or get_cache_dir())
+    cache.delete(str(key))
+
+
 def set_report_cache(report_name, job_id, value, timeout=15, cache_dir=None):
     if value:
         set_cache(_cache_key(report_name, job_id), value, timeout=timeout, cache_dir=cache_dir)
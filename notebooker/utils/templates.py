@@ -1,3 +1,4 @@
+import re
 from logging import getLogger
 from typing import Optional
 
@@ -11,6 +12,12 @@ from notebooker.utils.conversion import generate_ipynb_from_py
 from notebooker.utils.filesystem import get_template_dir
 
 logger = getLogger(__name__)
+# Jupytext cell markers, in either the "light" (# + / # -) or "percent" (# %%) formats.
+_CELL_START = re.compile(r"^# (\+|%%)(\s|$)")
+_LIGHT_CELL_END = re.compile(r"^# -\s*$")
+_PARAMETERS_TAG = re.compile(r"""\btags\b.*["']parameters["']""")
+# Lines which jupytext would un-comment (e.g. magics) when converting to .ipynb.
+_ESCAPED_LINE = re.compile(r"^#\s?[%!?]")
 
 
 def _valid_dirname(d):
@@ -30,6 +37,42 @@ def _get_parameters_cell_idx(notebook: nbformat.NotebookNode) -> Optional[int]:
     return None
 
 
+def _get_parameters_source_fast(py_path: str) -> Optional[str]:
+    """
+    Scans a .py template for the cell tagged with "parameters" and returns its source, without converting the whole
+    template to a notebook. Returns None if the cell can't be found confidently, in which case the caller should
+    fall back to reading the converted notebook.
+    """
+    with open(py_path, "r") as f:
+        lines = f.read().splitlines()
+    for start, line in enumerate(lines):
+        match = _CELL_START.match(line)
+        if match and _PARAMETERS_TAG.search(line):
+            is_light_format = match.group(1) == "+"
+            break
+    else:
+        return None
+    source = []
+    next_line = ""
+    for idx, line in enumerate(lines[start + 1 :], start + 1):
+        if _CELL_START.match(line):
+            break
+        if is_light_format and _LIGHT_CELL_END.match(line):
+            next_line = lines[idx + 1] if idx + 1 < len(lines) else ""
+            break
+        if _ESCAPED_LINE.match(line):
+            return None
+        source.append(line)
+    source = "\n".join(source).strip()
+    # A cell marker inside a multi-line string doesn't end the cell, so give up if that might be what we've found:
+    # either the string is left open, or code carries on straight after the end marker rather than after a blank line.
+    if source.count('"""') % 2 or source.count("'''") % 2:
+        return None
+    if next_line.strip() and not _CELL_START.match(next_line):
+        return None
+    return source
+
+
 def template_name_to_notebook_node(
     template_name: str, notebooker_disable_git: bool, py_template_dir: str, warn_on_local: Optional[bool] = True
 ) -> nbformat.NotebookNode:
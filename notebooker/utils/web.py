@@ -13,7 +13,10 @@ def _check_bad_chars(s, issues):
 
 def convert_report_name_url_to_path(report_name: AnyStr) -> AnyStr:
     # We expect the /run_report/path/to/file URL to resolve to a template under /templates/path/to/file.
-    return report_name.replace("/", os.sep) if isinstance(report_name, str) else report_name
+    # This runs on every routed request, and on POSIX the URL already is the path so there is nothing to replace.
+    if os.sep == "/" or not isinstance(report_name, str):
+        return report_name
+    return report_name.replace("/", os.sep)
 
 
 def convert_report_name_path_to_url(report_name: AnyStr) -> AnyStr:
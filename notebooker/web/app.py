@@ -21,7 +21,7 @@ from notebooker.web.report_hunter import _report_hunter
 from notebooker.web.routes.core import core_bp
 from notebooker.web.routes.index import index_bp
 from notebooker.web.routes.pending_results import pending_results_bp
-from notebooker.web.routes.run_report import run_report_bp
+from notebooker.web.routes.run_report import run_report_bp, start_report_forkserver
 from notebooker.web.routes.scheduling import scheduling_bp
 from notebooker.web.routes.serve_results import serve_results_bp
 
@@ -62,6 +62,7 @@ def start_app(webapp_config: WebappConfig):
     all_report_refresher = threading.Thread(target=_report_hunter, args=(webapp_config,))
     all_report_refresher.daemon = True
     all_report_refresher.start()
+    start_report_forkserver()
 
 
 def create_app(webapp_config=None):
@@ -3,7 +3,12 @@ from flask import Blueprint, jsonify, request
 import notebooker.version
 from notebooker.constants import DEFAULT_RESULT_LIMIT
 from notebooker.utils.results import get_all_available_results_json, get_count_and_latest_time_per_report
-from notebooker.web.utils import get_serializer, get_all_possible_templates, all_templates_flattened
+from notebooker.web.utils import (
+    all_templates_flattened,
+    flush_all_possible_templates_cache,
+    get_all_possible_templates,
+    get_serializer,
+)
 
 core_bp = Blueprint("core_bp", __name__)
 
@@ -68,6 +73,18 @@ def all_possible_templates_flattened():
     return jsonify({"result": all_templates_flattened()})
 
 
+@core_bp.route("/core/flush_template_cache", methods=["POST"])
+def flush_template_cache():
+    """
+    Clears the cached listing of possible reports, e.g. after new templates have been pulled from git. \
+    Otherwise, the listing is refreshed at most every 30 seconds.
+
+    :returns: A JSON mapping from "status" to "Flushed".
+    """
+    flush_all_possible_templates_cache()
+    return jsonify({"status": "Flushed"})
+
+
 @core_bp.route("/core/version")
 def get_version_no():
     """
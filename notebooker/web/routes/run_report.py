@@ -1,12 +1,16 @@
 from __future__ import unicode_literals
 
+import asyncio
+import concurrent.futures
 import datetime
 import json
+import multiprocessing
+import multiprocessing.forkserver
 import subprocess
 import sys
 import threading
-import time
 import uuid
+from functools import lru_cache, partial
 from logging import getLogger
 from typing import Any, Dict, List, Tuple, NamedTuple, Optional, AnyStr
 
@@ -16,10 +20,11 @@ from flask import Blueprint, abort, jsonify, render_template, request, url_for,
 from nbformat import NotebookNode
 
 from notebooker.constants import JobStatus
+from notebooker.serialization.mongo import MongoResultSerializer
 from notebooker.serialization.serialization import get_serializer_from_cls
-from notebooker.utils.conversion import generate_ipynb_from_py
+from notebooker.utils.conversion import _get_template_path, convert_report_name_into_path, generate_ipynb_from_py
 from notebooker.utils.filesystem import get_template_dir, get_output_dir
-from notebooker.utils.templates import _get_parameters_cell_idx, _get_preview
+from notebooker.utils.templates import _get_parameters_cell_idx, _get_parameters_source_fast, _get_preview
 from notebooker.utils.web import convert_report_name_url_to_path, json_to_python, validate_mailto, validate_title
 from notebooker.web.handle_overrides import handle_overrides
 from notebooker.web.utils import get_serializer, _get_python_template_dir, get_all_possible_templates
@@ -31,6 +36,19 @@ except NameError:
 
 run_report_bp = Blueprint("run_report_bp", __name__)
 logger = getLogger(__name__)
+# Stderr lines from a running report are written to the serializer in batches rather than one round-trip per line.
+STDERR_FLUSH_MAX_LINES = 50
+STDERR_FLUSH_INTERVAL_SECONDS = 0.25
+STDERR_READ_BLOCK_SIZE = 1 << 16
+# Reports are forked from a server process which has already imported these, rather than each one paying for the
+# interpreter start-up and imports of a fresh notebooker-cli process.
+REPORT_PROCESS_PRELOAD = ["notebooker._entrypoints", "nbformat", "pandas", "papermill"]
+# How long to wait for a report to signal that it has started, before assuming that it has.
+REPORT_START_TIMEOUT_SECONDS = 10
+# Reports run in a notebooker-cli subprocess can't signal that they have started, so give them this long to fail.
+REPORT_START_FALLBACK_SECONDS = 1
+_event_loop: Optional[asyncio.AbstractEventLoop] = None
+_event_loop_lock = threading.Lock()
 
 
 @run_report_bp.route("/run_report/get_preview/<path:report_name>", methods=["GET"])
@@ -43,10 +61,11 @@ def run_report_get_preview(report_name):
 
     :returns: An HTML rendering of a notebook template which has been converted from .py -> .ipynb -> .html
     """
+    # Handle the case where a rendered ipynb asks for "custom.css". There is nothing to serve, so let the browser cache
+    # the empty response rather than asking again with every preview.
+    if report_name.endswith(".css"):
+        return "", 204, {"Cache-Control": "public, max-age=31536000"}
     report_name = convert_report_name_url_to_path(report_name)
-    # Handle the case where a rendered ipynb asks for "custom.css"
-    if ".css" in report_name:
-        return ""
     return _get_preview(
         report_name,
         notebooker_disable_git=current_app.config["NOTEBOOKER_DISABLE_GIT"],
@@ -54,25 +73,62 @@ def run_report_get_preview(report_name):
     )
 
 
+@lru_cache(maxsize=128)
+def _read_nb(ipynb_path: str, mtime_ns: int) -> NotebookNode:
+    # mtime_ns is only part of the cache key, so that a changed file is read again.
+    return nbformat.read(ipynb_path, as_version=nbformat.v4.nbformat)
+
+
+@lru_cache(maxsize=128)
+def _convert_and_read_nb(
+    template_base_dir: str, relative_report_path: str, py_template_dir: str, mtime_ns: int
+) -> NotebookNode:
+    # mtime_ns is the modification time of the template source, so that edits to the template are converted again.
+    path = generate_ipynb_from_py(template_base_dir, relative_report_path, True, py_template_dir)
+    return nbformat.read(path, as_version=nbformat.v4.nbformat)
+
+
+def _template_is_pulled_from_git() -> bool:
+    return not current_app.config["NOTEBOOKER_DISABLE_GIT"] and bool(_get_python_template_dir())
+
+
 def get_report_as_nb(relative_report_path: str) -> NotebookNode:
-    path = generate_ipynb_from_py(
-        current_app.config["TEMPLATE_DIR"],
-        relative_report_path,
-        current_app.config["NOTEBOOKER_DISABLE_GIT"],
-        _get_python_template_dir(),
-    )
-    nb = nbformat.read(path, as_version=nbformat.v4.nbformat)
-    return nb
+    """
+    Converts the report template into a NotebookNode. This is memoized on the modification time of the underlying \
+    file, so the returned notebook is shared between requests and must not be mutated.
+    """
+    template_base_dir = current_app.config["TEMPLATE_DIR"]
+    py_template_dir = _get_python_template_dir()
+    if not _template_is_pulled_from_git():
+        # Without git, every conversion is written to a fresh directory, so memoize on the template source instead.
+        report_path = convert_report_name_into_path(relative_report_path)
+        template_path = _get_template_path(report_path, False, py_template_dir)
+        mtime_ns = os.stat(template_path).st_mtime_ns
+        return _convert_and_read_nb(template_base_dir, relative_report_path, py_template_dir, mtime_ns)
+    path = generate_ipynb_from_py(template_base_dir, relative_report_path, False, py_template_dir)
+    return _read_nb(path, os.stat(path).st_mtime_ns)
+
+
+def _params_html_from_nb(nb: NotebookNode, metadata_idx: Optional[int]) -> str:
+    if metadata_idx is None:
+        return ""
+    return nb["cells"][metadata_idx]["source"].strip()
+
+
+def get_report_parameters_html_from_nb(nb: NotebookNode) -> str:
+    return _params_html_from_nb(nb, _get_parameters_cell_idx(nb))
 
 
 def get_report_parameters_html(relative_report_path: str) -> str:
-    nb = get_report_as_nb(relative_report_path)
-    metadata_idx = _get_parameters_cell_idx(nb)
-    parameters_as_html = ""
-    if metadata_idx is not None:
-        metadata = nb["cells"][metadata_idx]
-        parameters_as_html = metadata["source"].strip()
-    return parameters_as_html
+    if not _template_is_pulled_from_git():
+        # The template on disk is already the latest one, so we can read the parameters straight out of it.
+        report_path = convert_report_name_into_path(relative_report_path)
+        template_path = _get_template_path(report_path, False, _get_python_template_dir())
+        if template_path.endswith(".py") and os.path.isfile(template_path):
+            parameters_as_html = _get_parameters_source_fast(template_path)
+            if parameters_as_html is not None:
+                return parameters_as_html
+    return get_report_parameters_html_from_nb(get_report_as_nb(relative_report_path))
 
 
 @run_report_bp.route("/get_report_parameters/<path:report_name>", methods=["GET"])
@@ -123,7 +179,7 @@ def run_report_http(report_name):
         has_prefix, has_suffix = (bool(nb["cells"][:metadata_idx]), bool(nb["cells"][metadata_idx + 1 :]))
     return render_template(
         "run_report.html",
-        parameters_as_html=get_report_parameters_html(report_name),
+        parameters_as_html=_params_html_from_nb(nb, metadata_idx),
         report_found=True,
         has_prefix=has_prefix,
         has_suffix=has_suffix,
@@ -134,18 +190,231 @@ def run_report_http(report_name):
     )
 
 
-def _monitor_stderr(process, job_id, serializer_cls, serializer_args):
+def _get_event_loop() -> asyncio.AbstractEventLoop:
+    """
+    Returns the event loop upon which report subprocesses are spawned and monitored, starting it if need be.
+    A single daemon thread multiplexes the stderr of every running report, rather than one thread per report.
+    """
+    global _event_loop
+    with _event_loop_lock:
+        if _event_loop is None:
+            _event_loop = asyncio.new_event_loop()
+            loop_thread = threading.Thread(target=_event_loop.run_forever, name="notebooker-report-monitor")
+            loop_thread.daemon = True
+            loop_thread.start()
+    return _event_loop
+
+
+class _ReportSubprocess:
+    """
+    Wraps a report subprocess so that its stderr can be read from the event loop. This deliberately doesn't use \
+    asyncio.create_subprocess_exec, since before python 3.8 asyncio's child watcher only works for a loop which is \
+    running on the main thread, and ours isn't.
+    """
+
+    def __init__(self, popen: subprocess.Popen, stderr: asyncio.StreamReader):
+        self._popen = popen
+        self._waited = None
+        self.stderr = stderr
+        self.returncode = None
+
+    async def wait(self) -> int:
+        if self._waited is None:
+            self._waited = asyncio.get_event_loop().run_in_executor(None, self._popen.wait)
+        # Shielded so that a waiter timing out doesn't cancel the wait for everyone else.
+        self.returncode = await asyncio.shield(self._waited)
+        return self.returncode
+
+    def kill(self) -> None:
+        self._popen.kill()
+
+
+async def _spawn(command: List[str]) -> _ReportSubprocess:
+    # Nothing reads the report's stdout, so don't let it fill up a pipe and block the report.
+    popen = subprocess.Popen(command, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+    stderr = asyncio.StreamReader()
+    await asyncio.get_event_loop().connect_read_pipe(lambda: asyncio.StreamReaderProtocol(stderr), popen.stderr)
+    return _ReportSubprocess(popen, stderr)
+
+
+def _get_report_mp_context() -> Optional[multiprocessing.context.BaseContext]:
+    """
+    Returns the multiprocessing context from which reports are forked, or None if this platform (i.e. Windows) can't \
+    fork them from a server process, in which case each report is run in a new notebooker-cli subprocess instead.
+    """
+    if "forkserver" not in multiprocessing.get_all_start_methods():
+        return None
+    context = multiprocessing.get_context("forkserver")
+    context.set_forkserver_preload(REPORT_PROCESS_PRELOAD)
+    return context
+
+
+def start_report_forkserver() -> None:
+    """Starts the server process from which reports are forked, so that the first report doesn't pay for it."""
+    if _get_report_mp_context() is not None:
+        multiprocessing.forkserver.ensure_running()
+
+
+def _execute_forked_report(cli_args: List[str], stderr_writer, ready_writer) -> None:
+    # Mirror the pipes which notebooker-cli would have had as a subprocess.
+    os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+    os.dup2(stderr_writer.fileno(), sys.stderr.fileno())
+    from notebooker._entrypoints import base_notebooker
+
+    base_notebooker.main(cli_args + ["--ready-fd", str(ready_writer.fileno())], prog_name="notebooker-cli")
+
+
+class _ForkedReportProcess:
+    """Wraps a forked report so that it can be monitored in the same way as a _ReportSubprocess."""
+
+    def __init__(self, process: multiprocessing.process.BaseProcess, stderr: asyncio.StreamReader):
+        self._process = process
+        self._joined = None
+        self.stderr = stderr
+        # Only set once the process has been joined; polling its exitcode from other threads is not safe.
+        self.returncode = None
+
+    async def wait(self) -> int:
+        if self._joined is None:
+            # Share one join between all waiters, since joining from several threads at once is not safe either.
+            self._joined = asyncio.get_event_loop().run_in_executor(None, self._process.join)
+        await self._joined
+        self.returncode = self._process.exitcode
+        return self.returncode
+
+
+async def _wait_for_report_start(process, ready_reader) -> None:
+    """
+    Waits until the report has signalled (by writing to ready_reader) that it has set up its directories and \
+    connected to its result serializer, or until it exits without doing so, in which case its returncode will \
+    have been set.
+    """
+    loop = asyncio.get_event_loop()
+    readable = loop.create_future()
+    loop.add_reader(ready_reader.fileno(), lambda: readable.done() or readable.set_result(None))
+    try:
+        await asyncio.wait_for(readable, REPORT_START_TIMEOUT_SECONDS)
+        if not os.read(ready_reader.fileno(), 1):
+            # EOF - the report has exited before starting
+            await process.wait()
+    except asyncio.TimeoutError:
+        logger.warning(f"The report did not signal that it had started within {REPORT_START_TIMEOUT_SECONDS}s.")
+    finally:
+        loop.remove_reader(ready_reader.fileno())
+        ready_reader.close()
+
+
+async def _spawn_report(cli_args: List[str]):
+    context = _get_report_mp_context()
+    if context is None:
+        # There's no portable way to hand a subprocess a pipe to signal on (pass_fds and add_reader are POSIX-only),
+        # so just give the report a moment to fail on its arguments.
+        process = await _spawn([sys.executable, "-m", "notebooker._entrypoints"] + cli_args)
+        try:
+            await asyncio.wait_for(process.wait(), REPORT_START_FALLBACK_SECONDS)
+        except asyncio.TimeoutError:
+            pass
+        return process
+    loop = asyncio.get_event_loop()
+    stderr_reader, stderr_writer = context.Pipe(duplex=False)
+    ready_reader, ready_writer = context.Pipe(duplex=False)
+    # Reports are daemonic so that they are terminated with the webapp, which marks them as cancelled on exit.
+    forked = context.Process(target=_execute_forked_report, args=(cli_args, stderr_writer, ready_writer), daemon=True)
+    # This blocks whilst the forkserver starts up for the first report, so keep it off the event loop.
+    await loop.run_in_executor(None, forked.start)
+    stderr_writer.close()
+    ready_writer.close()
+    stderr = asyncio.StreamReader()
+    await loop.connect_read_pipe(lambda: asyncio.StreamReaderProtocol(stderr), stderr_reader)
+    process = _ForkedReportProcess(forked, stderr)
+    await _wait_for_report_start(process, ready_reader)
+    return process
+
+
+@lru_cache(maxsize=8)
+def _cached_serializer(serializer_cls: str, serializer_args_json: str) -> MongoResultSerializer:
+    # Keyed on the JSON of the serializer args since they may contain unhashable values.
+    return get_serializer_from_cls(serializer_cls, **json.loads(serializer_args_json))
+
+
+def _log_stderr_monitor_failure(job_id: str, stderr_monitor: concurrent.futures.Future) -> None:
+    if not stderr_monitor.cancelled() and stderr_monitor.exception() is not None:
+        logger.error(f"Monitoring the stderr of job {job_id} failed.", exc_info=stderr_monitor.exception())
+
+
+@lru_cache(maxsize=8)
+def _static_cli_prefix(
+    output_dir: str,
+    template_dir: str,
+    py_template_base_dir: str,
+    py_template_subdir: str,
+    default_mailfrom: str,
+    notebooker_disable_git: bool,
+    serializer_cls: str,
+    serializer_args_json: str,
+) -> Tuple[str, ...]:
+    # The arguments before the subcommand only depend on the app's config, so only build them once per config.
+    serializer = _cached_serializer(serializer_cls, serializer_args_json)
+    return tuple(
+        [
+            "--output-base-dir",
+            output_dir,
+            "--template-base-dir",
+            template_dir,
+            "--py-template-base-dir",
+            py_template_base_dir,
+            "--py-template-subdir",
+            py_template_subdir,
+            "--default-mailfrom",
+            default_mailfrom,
+        ]
+        + (["--notebooker-disable-git"] if notebooker_disable_git else [])
+        + ["--serializer-cls", serializer.__class__.__name__]
+        + serializer.serializer_args_to_cmdline_args()
+    )
+
+
+async def _monitor_stderr(process, job_id, serializer_cls, serializer_args_json):
     stderr = []
-    # Unsure whether flask app contexts are thread-safe; just reinitialise the serializer here.
-    result_serializer = get_serializer_from_cls(serializer_cls, **serializer_args)
+    pending = []
+    loop = asyncio.get_event_loop()
+    # Unsure whether flask app contexts are thread-safe, so don't use get_serializer(). Instead share one serializer
+    # (and so one connection pool) between all of the monitored reports.
+    result_serializer = _cached_serializer(serializer_cls, serializer_args_json)
+    last_flush = loop.time()
+    partial_line = b""
     while True:
-        line = process.stderr.readline().decode("utf-8")
-        if line == "" and process.poll() is not None:
-            result_serializer.update_stdout(job_id, stderr, replace=True)
-            break
-        stderr.append(line)
-        logger.info(line)  # So that we have it in the log, not just in memory.
-        result_serializer.update_stdout(job_id, new_lines=[line])
+        # Wait with a timeout so that an idle subprocess still gets its pending lines flushed.
+        try:
+            # Read whatever is available in large blocks rather than a line at a time; chatty reports can write
+            # thousands of lines between two iterations of this loop.
+            chunk = await asyncio.wait_for(process.stderr.read(STDERR_READ_BLOCK_SIZE), STDERR_FLUSH_INTERVAL_SECONDS)
+        except asyncio.TimeoutError:
+            chunk = None
+        if chunk is not None:
+            if chunk == b"":  # EOF
+                if partial_line:
+                    stderr.append(partial_line.decode("utf-8"))
+                    pending.append(stderr[-1])
+                break
+            # Hold back any incomplete trailing line (which may end mid-way through a utf-8 character) until the rest
+            # of it is read.
+            *lines, partial_line = (partial_line + chunk).split(b"\n")
+            lines = [line.decode("utf-8") + "\n" for line in lines]
+            stderr.extend(lines)
+            pending.extend(lines)
+        if pending and (
+            len(pending) >= STDERR_FLUSH_MAX_LINES or loop.time() - last_flush > STDERR_FLUSH_INTERVAL_SECONDS
+        ):
+            logger.info("".join(pending))  # So that we have it in the log, not just in memory.
+            # Serializer calls block, so keep them off the loop which is monitoring the other reports.
+            await loop.run_in_executor(None, partial(result_serializer.update_stdout, job_id, new_lines=pending))
+            pending = []
+            last_flush = loop.time()
+    await process.wait()
+    if pending:
+        logger.info("".join(pending))
+    await loop.run_in_executor(None, partial(result_serializer.update_stdout, job_id, stderr, replace=True))
     return "".join(stderr)
 
 
@@ -161,10 +430,11 @@ def run_report(
     run_synchronously=False,
     mailfrom=None,
     n_retries=3,
+    overrides_json=None,
 ) -> str:
     """
     Actually run the report in earnest.
-    Uses a subprocess to execute the report asynchronously, which is identical to the non-webapp entrypoint.
+    Uses a separate process to execute the report asynchronously, which is identical to the non-webapp entrypoint.
     :param report_name: `str` The report which we are executing
     :param report_title: `str` The user-specified title of the report
     :param mailto: `Optional[str]` Who the results will be emailed to
@@ -172,12 +442,14 @@ def run_report(
     :param generate_pdf_output: `bool` Whether we're generating a PDF. Defaults to False.
     :param prepare_only: `bool` Whether to do everything except execute the notebook. Useful for testing.
     :param scheduler_job_id: `Optional[str]` if the job was triggered from the scheduler, this is the scheduler's job id
-    :param run_synchronously: `bool` If True, then we will join the stderr monitoring thread until the job has completed
+    :param run_synchronously: `bool` If True, then we will wait for the stderr monitoring until the job has completed
     :param mailfrom: `str` if passed, then this string will be used in the from field
     :param n_retries: The number of retries to attempt.
+    :param overrides_json: `Optional[str]` The overrides, already serialised as JSON. If not passed, they will be \
+        serialised from `overrides`.
     :return: The unique job_id.
     """
-    job_id = str(uuid.uuid4())
+    job_id = uuid.uuid4().hex
     job_start_time = datetime.datetime.now()
     result_serializer = get_serializer()
     result_serializer.save_check_stub(
@@ -193,23 +465,21 @@ def run_report(
         scheduler_job_id=scheduler_job_id,
     )
     app_config = current_app.config
-    command = (
-        [
-            os.path.join(sys.exec_prefix, "bin", "notebooker-cli"),
-            "--output-base-dir",
-            get_output_dir(),
-            "--template-base-dir",
-            get_template_dir(),
-            "--py-template-base-dir",
-            app_config["PY_TEMPLATE_BASE_DIR"],
-            "--py-template-subdir",
-            app_config["PY_TEMPLATE_SUBDIR"],
-            "--default-mailfrom",
-            app_config["DEFAULT_MAILFROM"],
-        ]
-        + (["--notebooker-disable-git"] if app_config["NOTEBOOKER_DISABLE_GIT"] else [])
-        + ["--serializer-cls", result_serializer.__class__.__name__]
-        + result_serializer.serializer_args_to_cmdline_args()
+    serializer_cls = app_config["SERIALIZER_CLS"]
+    serializer_args_json = json.dumps(app_config["SERIALIZER_CONFIG"], sort_keys=True)
+    cli_args = (
+        list(
+            _static_cli_prefix(
+                get_output_dir(),
+                get_template_dir(),
+                app_config["PY_TEMPLATE_BASE_DIR"],
+                app_config["PY_TEMPLATE_SUBDIR"],
+                app_config["DEFAULT_MAILFROM"],
+                app_config["NOTEBOOKER_DISABLE_GIT"],
+                serializer_cls,
+                serializer_args_json,
+            )
+        )
         + [
             "execute-notebook",
             "--job-id",
@@ -221,7 +491,7 @@ def run_report(
             "--mailto",
             mailto,
             "--overrides-as-json",
-            json.dumps(overrides),
+            json.dumps(overrides) if overrides_json is None else overrides_json,
             "--pdf-output" if generate_pdf_output else "--no-pdf-output",
             "--hide-code" if hide_code else "--show-code",
             "--n-retries", str(n_retries),
@@ -230,19 +500,16 @@ def run_report(
         + ([f"--scheduler-job-id={scheduler_job_id}"] if scheduler_job_id is not None else [])
         + ([f"--mailfrom={mailfrom}"] if mailfrom is not None else [])
     )
-    p = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-
-    stderr_thread = threading.Thread(
-        target=_monitor_stderr,
-        args=(p, job_id, current_app.config["SERIALIZER_CLS"], current_app.config["SERIALIZER_CONFIG"]),
+    loop = _get_event_loop()
+    p = asyncio.run_coroutine_threadsafe(_spawn_report(cli_args), loop).result()
+    stderr_monitor = asyncio.run_coroutine_threadsafe(
+        _monitor_stderr(p, job_id, serializer_cls, serializer_args_json), loop
     )
-    stderr_thread.daemon = True
-    stderr_thread.start()
     if run_synchronously:
-        p.wait()
+        stderr_monitor.result()
     else:
-        time.sleep(1)
-        p.poll()
+        # Nothing else waits on the monitor, so make sure that we hear about it if it dies.
+        stderr_monitor.add_done_callback(partial(_log_stderr_monitor_failure, job_id))
     if p.returncode:
         raise RuntimeError(f"The report execution failed with exit code {p.returncode}")
 
@@ -282,7 +549,7 @@ def validate_run_params(params, issues: List[str]) -> RunReportParams:
 
 
 def _handle_run_report(
-    report_name: str, overrides_dict: Dict[str, Any], issues: List[str]
+    report_name: str, overrides_dict: Dict[str, Any], issues: List[str], overrides_json: Optional[str] = None
 ) -> Tuple[str, int, Dict[str, str]]:
     params = validate_run_params(request.values, issues)
     if issues:
@@ -306,6 +573,7 @@ def _handle_run_report(
             hide_code=params.hide_code,
             scheduler_job_id=params.scheduler_job_id,
             mailfrom=params.mailfrom,
+            overrides_json=overrides_json,
         )
         return (
             jsonify({"id": job_id}),
@@ -327,9 +595,10 @@ def run_report_json(report_name):
     :returns: 202-redirects to the "task_status" interface.
     """
     issues = []
-    # Get JSON overrides
-    overrides_dict = json.loads(request.values.get("overrides"))
-    return _handle_run_report(report_name, overrides_dict, issues)
+    # Get JSON overrides. These are passed through to the report as-is, rather than being serialised all over again.
+    overrides_json = request.values.get("overrides")
+    overrides_dict = json.loads(overrides_json)
+    return _handle_run_report(report_name, overrides_dict, issues, overrides_json=overrides_json)
 
 
 @run_report_bp.route("/run_report/<path:report_name>", methods=["POST"])
@@ -9,9 +9,11 @@ from werkzeug.datastructures import ImmutableMultiDict
 from notebooker.constants import python_template_dir
 from notebooker.serialization.mongo import MongoResultSerializer
 from notebooker.serialization.serialization import get_serializer_from_cls
+from notebooker.utils.caching import delete_cache, get_cache, set_cache
 from notebooker.utils.templates import _valid_dirname, _valid_filename, _gen_all_templates
 
 logger = getLogger(__name__)
+ALL_TEMPLATES_CACHE_TIMEOUT = 30
 
 
 def get_serializer() -> MongoResultSerializer:
@@ -29,19 +31,43 @@ def _get_python_template_dir() -> str:
     return python_template_dir(current_app.config["PY_TEMPLATE_BASE_DIR"], current_app.config["PY_TEMPLATE_SUBDIR"])
 
 
-def get_all_possible_templates(warn_on_local=True):
+def _all_templates_starting_point(warn_on_local=True) -> str:
     if _get_python_template_dir():
-        all_checks = get_directory_structure()
-    else:
-        if warn_on_local:
-            logger.warning("Fetching all possible checks from local repo. New updates will not be retrieved from git.")
-        # Only import here because we don't actually want to import these if the app is working properly.
-        from notebooker import notebook_templates_example
-
-        all_checks = get_directory_structure(os.path.abspath(notebook_templates_example.__path__[0]))
+        return _get_python_template_dir()
+    if warn_on_local:
+        logger.warning("Fetching all possible checks from local repo. New updates will not be retrieved from git.")
+    # Only import here because we don't actually want to import these if the app is working properly.
+    from notebooker import notebook_templates_example
+
+    return os.path.abspath(notebook_templates_example.__path__[0])
+
+
+def _all_templates_cache_key(starting_point: str):
+    # Include the mtime so that adding or removing templates at the top level invalidates the cache immediately.
+    try:
+        mtime_ns = os.stat(starting_point).st_mtime_ns
+    except OSError:
+        mtime_ns = None
+    return "all_possible_templates", starting_point, mtime_ns
+
+
+def get_all_possible_templates(warn_on_local=True):
+    starting_point = _all_templates_starting_point(warn_on_local)
+    if not current_app.config.get("CACHE_DIR"):
+        # e.g. when listing templates outside of the webapp, where there is nowhere to cache them.
+        return get_directory_structure(starting_point)
+    cache_key = _all_templates_cache_key(starting_point)
+    all_checks = get_cache(cache_key)
+    if all_checks is None:
+        all_checks = get_directory_structure(starting_point)
+        set_cache(cache_key, all_checks, timeout=ALL_TEMPLATES_CACHE_TIMEOUT)
     return all_checks
 
 
+def flush_all_possible_templates_cache():
+    delete_cache(_all_templates_cache_key(_all_templates_starting_point(warn_on_local=False)))
+
+
 def get_directory_structure(starting_point: Optional[str] = None) -> Dict[str, Union[Dict, None]]:
     """
     Creates a nested dictionary that represents the folder structure of rootdir
@@ -19,6 +19,26 @@ def test_create_schedule(flask_app, setup_workspace):
         assert data == {"result": ["fake/py_report", "fake/ipynb_report", "fake/report_failing"]}
 
 
+def test_flush_template_cache(flask_app, setup_workspace, workspace):
+    with flask_app.test_client() as client:
+        rv = client.get("/core/all_possible_templates_flattened")
+        assert json.loads(rv.data) == {"result": ["fake/py_report", "fake/ipynb_report", "fake/report_failing"]}
+
+        (workspace.workspace + "/templates/fake/new_report.py").write_lines(["print(1)"])
+        rv = client.get("/core/all_possible_templates_flattened")
+        assert json.loads(rv.data) == {"result": ["fake/py_report", "fake/ipynb_report", "fake/report_failing"]}
+
+        rv = client.post("/core/flush_template_cache")
+        assert rv.status_code == 200
+        rv = client.get("/core/all_possible_templates_flattened")
+        assert sorted(json.loads(rv.data)["result"]) == [
+            "fake/ipynb_report",
+            "fake/new_report",
+            "fake/py_report",
+            "fake/report_failing",
+        ]
+
+
 def test_version_number(flask_app, setup_workspace):
     with flask_app.test_client() as client:
         rv = client.get(
@@ -40,4 +40,5 @@ def test_run_report_json_parameters(flask_app, setup_workspace):
                 hide_code=hide_code,
                 scheduler_job_id=scheduler_job_id,
                 mailfrom=mailfrom,
+                overrides_json=json.dumps(overrides),
             )
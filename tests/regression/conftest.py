@@ -0,0 +1,18 @@
+import pytest
+
+from notebooker.utils.conversion import generate_ipynb_from_py
+
+from ..utils import all_templates
+
+
+@pytest.fixture(scope="session")
+def converted_templates(tmp_path_factory):
+    """
+    Converts every template to .ipynb once per session rather than once per test. Under pytest-xdist
+    (e.g. pytest -n auto tests/regression) each worker has its own session, and so its own directory.
+    """
+    template_base_dir = str(tmp_path_factory.mktemp("converted_templates"))
+    return {
+        template_name: generate_ipynb_from_py(template_base_dir, template_name, False, "", warn_on_local=False)
+        for template_name in all_templates()
+    }
@@ -1,6 +1,7 @@
 import datetime
 import uuid
 
+import mock
 import pytest
 
 from notebooker.execute_notebook import _run_checks
@@ -9,9 +10,11 @@ from ..utils import all_templates
 
 
 @pytest.mark.parametrize("template_name", all_templates())
-def test_execution_of_templates(template_name, template_dir, output_dir, flask_app):
+def test_execution_of_templates(template_name, converted_templates, template_dir, output_dir, flask_app):
     flask_app.config["PY_TEMPLATE_DIR"] = ""
-    with flask_app.app_context():
+    with flask_app.app_context(), mock.patch(
+        "notebooker.execute_notebook.generate_ipynb_from_py", return_value=converted_templates[template_name]
+    ):
         _run_checks(
             "job_id_{}".format(str(uuid.uuid4())[:6]),
             datetime.datetime.now(),
@@ -1,11 +1,43 @@
-import subprocess
+import asyncio
+import concurrent.futures
+import json
+import os
+import shutil
 import sys
+import tempfile
 
 import mock
+from flask import Flask
 from werkzeug.datastructures import CombinedMultiDict, ImmutableMultiDict
 
 from notebooker.constants import DEFAULT_SERIALIZER
-from notebooker.web.routes.run_report import _monitor_stderr, validate_run_params, RunReportParams
+from notebooker.utils.conversion import generate_ipynb_from_py
+from notebooker.web.routes.run_report import (
+    RunReportParams,
+    _cached_serializer,
+    _convert_and_read_nb,
+    _get_event_loop,
+    _log_stderr_monitor_failure,
+    _monitor_stderr,
+    _spawn,
+    _spawn_report,
+    _static_cli_prefix,
+    get_report_as_nb,
+    get_report_parameters_html_from_nb,
+    run_report_bp,
+    validate_run_params,
+)
+
+
+def _run_and_monitor_stderr(dummy_process, serializer_args=None, clear_cache=True):
+    if clear_cache:
+        _cached_serializer.cache_clear()
+
+    async def _run():
+        p = await _spawn([sys.executable, "-c", dummy_process])
+        return await _monitor_stderr(p, "abc123", DEFAULT_SERIALIZER, json.dumps(serializer_args or {}, sort_keys=True))
+
+    return asyncio.run_coroutine_threadsafe(_run(), _get_event_loop()).result()
 
 
 def test_monitor_stderr():
@@ -20,21 +52,204 @@ sys.stderr.write(u'This is going to stderr a bit later\\n')
     expected_output = """This is going to stderr
 This is going to stderr a bit later
 """
-    p = subprocess.Popen([sys.executable, "-c", dummy_process], stderr=subprocess.PIPE)
-
     with mock.patch("notebooker.web.routes.run_report.get_serializer_from_cls") as serializer:
-        stderr_output = _monitor_stderr(p, "abc123", DEFAULT_SERIALIZER, {})
+        stderr_output = _run_and_monitor_stderr(dummy_process)
     assert stderr_output == expected_output
 
-    serializer().update_stdout.assert_has_calls(
-        [
-            mock.call("abc123", new_lines=["This is going to stderr\n"]),
-            mock.call("abc123", new_lines=["This is going to stderr a bit later\n"]),
-            mock.call("abc123", ['This is going to stderr\n', 'This is going to stderr a bit later\n'], replace=True)
-        ]
+    update_stdout = serializer().update_stdout
+    # The first line is flushed once the subprocess goes idle; the full output is always written at EOF.
+    assert update_stdout.mock_calls[0] == mock.call("abc123", new_lines=["This is going to stderr\n"])
+    assert update_stdout.mock_calls[-1] == mock.call(
+        "abc123", ["This is going to stderr\n", "This is going to stderr a bit later\n"], replace=True
     )
 
 
+def test_monitor_stderr_batches_lines():
+    dummy_process = """
+import sys
+for i in range(120):
+    sys.stderr.write(u'line {}\\n'.format(i))
+"""
+    with mock.patch("notebooker.web.routes.run_report.get_serializer_from_cls") as serializer:
+        stderr_output = _run_and_monitor_stderr(dummy_process)
+    expected_lines = ["line {}\n".format(i) for i in range(120)]
+    assert stderr_output == "".join(expected_lines)
+
+    update_stdout = serializer().update_stdout
+    *batched_calls, final_call = update_stdout.mock_calls
+    assert final_call == mock.call("abc123", expected_lines, replace=True)
+    assert len(batched_calls) < len(expected_lines)
+    # Lines still pending at EOF are only saved by the final call.
+    flushed_lines = [line for c in batched_calls for line in c.kwargs["new_lines"]]
+    assert flushed_lines == expected_lines[: len(flushed_lines)]
+
+
+def test_monitor_stderr_reassembles_partial_lines():
+    dummy_process = """
+import sys, time
+sys.stderr.buffer.write(b'caf\\xc3')
+sys.stderr.flush()
+time.sleep(0.5)
+sys.stderr.buffer.write(b'\\xa9\\nno trailing newline')
+"""
+    with mock.patch("notebooker.web.routes.run_report.get_serializer_from_cls") as serializer:
+        stderr_output = _run_and_monitor_stderr(dummy_process)
+    assert stderr_output == "caf\u00e9\nno trailing newline"
+    assert serializer().update_stdout.mock_calls[-1] == mock.call(
+        "abc123", ["caf\u00e9\n", "no trailing newline"], replace=True
+    )
+
+
+def test_log_stderr_monitor_failure():
+    succeeded, failed = concurrent.futures.Future(), concurrent.futures.Future()
+    succeeded.set_result("stderr")
+    error = RuntimeError("Mongo is down")
+    failed.set_exception(error)
+    with mock.patch("notebooker.web.routes.run_report.logger") as logger:
+        _log_stderr_monitor_failure("abc123", succeeded)
+        assert not logger.error.called
+        _log_stderr_monitor_failure("abc123", failed)
+    logger.error.assert_called_once_with("Monitoring the stderr of job abc123 failed.", exc_info=error)
+
+
+def test_monitor_stderr_reuses_serializer():
+    serializer_args = {"MONGO_HOST": "localhost", "DATABASE_NAME": "notebooker"}
+    with mock.patch("notebooker.web.routes.run_report.get_serializer_from_cls") as serializer:
+        _run_and_monitor_stderr("", serializer_args)
+        _run_and_monitor_stderr("", serializer_args, clear_cache=False)
+    serializer.assert_called_once_with(DEFAULT_SERIALIZER, DATABASE_NAME="notebooker", MONGO_HOST="localhost")
+
+
+def test_static_cli_prefix_is_built_once_per_config():
+    _cached_serializer.cache_clear()
+    _static_cli_prefix.cache_clear()
+    args = ("/output", "/templates", "/py_templates", "", "test@example.com", True, DEFAULT_SERIALIZER, "{}")
+    with mock.patch("notebooker.web.routes.run_report.get_serializer_from_cls") as serializer:
+        serializer().serializer_args_to_cmdline_args.return_value = ["--mongo-host", "localhost"]
+        prefix = _static_cli_prefix(*args)
+        assert _static_cli_prefix(*args) is prefix
+    assert prefix == (
+        "--output-base-dir",
+        "/output",
+        "--template-base-dir",
+        "/templates",
+        "--py-template-base-dir",
+        "/py_templates",
+        "--py-template-subdir",
+        "",
+        "--default-mailfrom",
+        "test@example.com",
+        "--notebooker-disable-git",
+        "--serializer-cls",
+        "MagicMock",
+        "--mongo-host",
+        "localhost",
+    )
+    assert serializer().serializer_args_to_cmdline_args.call_count == 1
+
+
+def _run_forked_report(cli_args):
+    _cached_serializer.cache_clear()
+
+    async def _run():
+        p = await _spawn_report(cli_args)
+        stderr_output = await _monitor_stderr(p, "abc123", DEFAULT_SERIALIZER, "{}")
+        return p.returncode, stderr_output
+
+    return asyncio.run_coroutine_threadsafe(_run(), _get_event_loop()).result()
+
+
+def test_spawn_report_returns_once_report_exits_without_starting():
+    process = asyncio.run_coroutine_threadsafe(_spawn_report(["execute-notebook"]), _get_event_loop()).result()
+    # No report name was given, so the report fails before signalling that it has started.
+    assert process.returncode == 1
+
+
+def test_spawn_report_captures_forked_report_errors():
+    with mock.patch("notebooker.web.routes.run_report.get_serializer_from_cls") as serializer:
+        returncode, stderr_output = _run_forked_report(["execute-notebook"])
+    assert returncode == 1
+    assert "ValueError: Error! Please provide a --report-name." in stderr_output
+    assert serializer().update_stdout.mock_calls[-1] == mock.call(
+        "abc123", stderr_output.splitlines(True), replace=True
+    )
+
+
+@mock.patch("notebooker.web.routes.run_report._get_report_mp_context", return_value=None)
+@mock.patch("notebooker.web.routes.run_report.REPORT_START_FALLBACK_SECONDS", 0.5)
+def test_spawn_report_without_forkserver(_get_report_mp_context):
+    spawned = []
+
+    async def _fake_spawn(command):
+        spawned.append(command)
+        # The "report" exits with the code given in its last argument, after the time given in the one before.
+        return await _spawn(
+            [sys.executable, "-c", "import sys, time; time.sleep(float(sys.argv[-2])); sys.exit(int(sys.argv[-1]))"]
+            + command[-2:]
+        )
+
+    def _spawn_fake_report(cli_args):
+        return asyncio.run_coroutine_threadsafe(_spawn_report(cli_args), _get_event_loop()).result()
+
+    with mock.patch("notebooker.web.routes.run_report._spawn", _fake_spawn):
+        still_running = _spawn_fake_report(["5", "0"])
+        failed = _spawn_fake_report(["0", "3"])
+    try:
+        # Reports which run for longer than the fallback wait are assumed to have started...
+        assert still_running.returncode is None
+        # ...whereas ones which fail within it are reported as having failed.
+        assert failed.returncode == 3
+        assert spawned[0] == [sys.executable, "-m", "notebooker._entrypoints", "5", "0"]
+    finally:
+        still_running.kill()
+
+
+def test_get_report_as_nb_is_memoized_on_template_mtime():
+    py_template_dir = tempfile.mkdtemp()
+    template_base_dir = tempfile.mkdtemp()
+    try:
+        template_path = os.path.join(py_template_dir, "my_report.py")
+        with open(template_path, "w") as f:
+            f.write('# + {"tags": ["parameters"]}\na = 1\n')
+        app = Flask(__name__)
+        app.config.update(
+            TEMPLATE_DIR=template_base_dir,
+            PY_TEMPLATE_BASE_DIR=py_template_dir,
+            PY_TEMPLATE_SUBDIR="",
+            NOTEBOOKER_DISABLE_GIT=True,
+        )
+        _convert_and_read_nb.cache_clear()
+        with app.app_context(), mock.patch(
+            "notebooker.web.routes.run_report.generate_ipynb_from_py", wraps=generate_ipynb_from_py
+        ) as generate:
+            nb = get_report_as_nb("my_report")
+            assert get_report_as_nb("my_report") is nb
+            assert get_report_parameters_html_from_nb(nb) == "a = 1"
+            assert generate.call_count == 1
+
+            with open(template_path, "w") as f:
+                f.write('# + {"tags": ["parameters"]}\na = 2\n')
+            os.utime(template_path, ns=(0, os.stat(template_path).st_mtime_ns + 1))
+            assert get_report_parameters_html_from_nb(get_report_as_nb("my_report")) == "a = 2"
+            assert generate.call_count == 2
+    finally:
+        shutil.rmtree(py_template_dir)
+        shutil.rmtree(template_base_dir)
+
+
+def test_run_report_get_preview_short_circuits_css():
+    app = Flask(__name__)
+    app.register_blueprint(run_report_bp)
+    with mock.patch("notebooker.web.routes.run_report.convert_report_name_url_to_path") as convert, mock.patch(
+        "notebooker.web.routes.run_report._get_preview"
+    ) as get_preview:
+        rv = app.test_client().get("/run_report/get_preview/my/report/custom.css")
+    assert rv.status_code == 204
+    assert rv.headers["Cache-Control"] == "public, max-age=31536000"
+    assert not convert.called
+    assert not get_preview.called
+
+
 def test_validate_run_params():
     input_params = CombinedMultiDict(
         [
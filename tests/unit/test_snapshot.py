@@ -1,23 +1,34 @@
 from __future__ import unicode_literals
 
+import json
+import os
+import shutil
+import tempfile
+import threading
+
 import mock
+import pytest
 from click.testing import CliRunner
 
 from notebooker import constants, snapshot
 from notebooker._entrypoints import base_notebooker
 
 
+def _read(path, mode="r"):
+    with open(path, mode) as f:
+        return f.read()
+
+
 def test_snapshot_latest_successful_notebooks():
-    compat_builtin = "builtins.open"
-    with mock.patch(compat_builtin) as fopen:
+    output_dir = tempfile.mkdtemp()
+    try:
         with mock.patch("notebooker.snapshot.get_latest_successful_job_results_all_params") as get_results:
             with mock.patch("notebooker.snapshot.get_serializer_from_cls"):
                 result = mock.Mock(spec=constants.NotebookResultComplete)
                 result.overrides = {"over": "ride"}
                 result.raw_html = "some html"
-                result.raw_html_resources = {"outputs": {"out/put/img.png": "blah"}}
+                result.raw_html_resources = {"outputs": {"out/put/img.png": b"blah"}}
                 get_results.return_value = [result]
-                output_dir = "html_output_dir"
                 report_name = "my/test_report"
                 runner = CliRunner()
 
@@ -33,49 +44,158 @@ def test_snapshot_latest_successful_notebooks():
                 )
 
                 assert not cli_result.exception, cli_result.output
-                fopen.assert_any_call("html_output_dir/test_report/over_ride.html", "w")
-                fopen().__enter__().write.assert_any_call("some html")
-                fopen.assert_any_call("html_output_dir/test_report/out/put/img.png", "wb")
-                fopen().__enter__().write.assert_any_call("blah")
+        html_name = "{}.html".format(snapshot._overrides_key({"over": "ride"}))
+        assert _read(os.path.join(output_dir, "test_report", html_name)) == "some html"
+        assert _read(os.path.join(output_dir, "test_report/out/put/img.png"), "rb") == b"blah"
+        assert json.loads(_read(os.path.join(output_dir, "test_report/manifest.json"))) == {html_name: {"over": "ride"}}
+    finally:
+        shutil.rmtree(output_dir)
 
 
 @mock.patch("notebooker.snapshot._write_notebook_html")
 @mock.patch("notebooker.snapshot._write_notebook_outputs")
 def test_write_results(_write_notebook_outputs, _write_notebook_html):
-    results = [mock.sentinel.result1, mock.sentinel.result2]
-    snapshot._write_results(results, mock.sentinel.directory)
-    _write_notebook_html.assert_has_calls(
-        [
-            mock.call(mock.sentinel.result1, mock.sentinel.directory),
-            mock.call(mock.sentinel.result2, mock.sentinel.directory),
-        ]
-    )
-    _write_notebook_outputs.assert_has_calls(
-        [
-            mock.call(mock.sentinel.result1, mock.sentinel.directory),
-            mock.call(mock.sentinel.result2, mock.sentinel.directory),
-        ]
-    )
+    output_dir = tempfile.mkdtemp()
+    result1 = mock.Mock(spec=constants.NotebookResultComplete)
+    result1.overrides = {"a": 1}
+    result1.raw_html_resources = {"outputs": {"out/img.png": b"blah"}}
+    result2 = mock.Mock(spec=constants.NotebookResultComplete)
+    result2.overrides = {"a": 2}
+    result2.raw_html_resources = {"outputs": {"out/img2.png": b"blah"}}
+    try:
+        snapshot._write_results(iter([result1, result2]), output_dir)
+        created_dirs = {output_dir, os.path.join(output_dir, "out")}
+        assert os.path.isdir(os.path.join(output_dir, "out"))
+        assert json.loads(_read(os.path.join(output_dir, "manifest.json"))) == {
+            "{}.html".format(snapshot._overrides_key({"a": 1})): {"a": 1},
+            "{}.html".format(snapshot._overrides_key({"a": 2})): {"a": 2},
+        }
+        _write_notebook_html.assert_has_calls(
+            [
+                mock.call(result1, output_dir, created_dirs),
+                mock.call(result2, output_dir, created_dirs),
+            ],
+            any_order=True,
+        )
+        _write_notebook_outputs.assert_has_calls(
+            [
+                mock.call(result1, output_dir, created_dirs),
+                mock.call(result2, output_dir, created_dirs),
+            ],
+            any_order=True,
+        )
+    finally:
+        shutil.rmtree(output_dir)
+
+
+@mock.patch("notebooker.snapshot.SNAPSHOT_MAX_WORKERS", 1)
+@mock.patch("notebooker.snapshot.SNAPSHOT_MAX_IN_FLIGHT", 4)
+def test_write_results_limits_results_in_flight():
+    output_dir = tempfile.mkdtemp()
+    writes_released = threading.Event()
+    results_read = []
+
+    def _results():
+        for i in range(10):
+            result = mock.Mock(spec=constants.NotebookResultComplete)
+            result.overrides = {"a": i}
+            result.raw_html_resources = {"outputs": {}}
+            results_read.append(result)
+            yield result
+
+    def _slow_write(*args):
+        writes_released.wait()
+
+    try:
+        with mock.patch("notebooker.snapshot._write_notebook_html", side_effect=_slow_write), mock.patch(
+            "notebooker.snapshot._write_notebook_outputs", side_effect=_slow_write
+        ):
+            writer = threading.Thread(target=snapshot._write_results, args=(_results(), output_dir))
+            writer.start()
+            writer.join(0.5)
+            # Two writes per result, so writing stalls with only two results read.
+            assert len(results_read) == 2
+            writes_released.set()
+            writer.join()
+        assert len(results_read) == 10
+    finally:
+        writes_released.set()
+        shutil.rmtree(output_dir)
+
+
+@mock.patch("notebooker.snapshot._write_notebook_outputs")
+def test_write_results_raises_writer_errors(_write_notebook_outputs):
+    _write_notebook_outputs.side_effect = OSError("Disk full")
+    output_dir = tempfile.mkdtemp()
+    result = mock.Mock(spec=constants.NotebookResultComplete)
+    result.overrides = {}
+    result.raw_html = "some html"
+    result.raw_html_resources = {"outputs": {}}
+    try:
+        with pytest.raises(OSError, match="Disk full"):
+            snapshot._write_results([result], output_dir)
+    finally:
+        shutil.rmtree(output_dir)
 
 
 def test_write_notebook_html():
-    compat_builtin = "builtins.open"
-    output_dir = "output_dir"
+    output_dir = tempfile.mkdtemp()
     result = mock.Mock(spec=constants.NotebookResultComplete)
     result.overrides = {"over": "ride"}
     result.raw_html = "some html"
-    with mock.patch(compat_builtin) as fopen:
+    try:
         snapshot._write_notebook_html(result, output_dir)
-        fopen.assert_any_call("output_dir/over_ride.html", "w")
-        fopen().__enter__().write.assert_any_call("some html")
+        assert os.listdir(output_dir) == ["{}.html".format(snapshot._overrides_key({"over": "ride"}))]
+        assert _read(os.path.join(output_dir, os.listdir(output_dir)[0])) == "some html"
+    finally:
+        shutil.rmtree(output_dir)
+
+
+@pytest.mark.parametrize("raw_html", ["<p>Some html \u2603</p>" * 10, b"<p>Some html</p>" * 10], ids=["str", "bytes"])
+def test_write_notebook_html_in_chunks(raw_html):
+    output_dir = tempfile.mkdtemp()
+    result = mock.Mock(spec=constants.NotebookResultComplete)
+    result.overrides = {}
+    result.raw_html = raw_html
+    try:
+        with mock.patch("notebooker.snapshot.SNAPSHOT_WRITE_CHUNK_SIZE", 7):
+            snapshot._write_notebook_html(result, output_dir)
+        expected = raw_html if isinstance(raw_html, bytes) else raw_html.encode("utf-8")
+        assert _read(os.path.join(output_dir, "{}.html".format(snapshot._overrides_key({}))), "rb") == expected
+    finally:
+        shutil.rmtree(output_dir)
+
+
+@pytest.mark.parametrize(
+    "overrides",
+    [{"a": 1}, {"a": "../../etc/passwd"}, {"a" * 1000: list(range(1000))}],
+    ids=["simple", "path separators", "long"],
+)
+def test_overrides_key(overrides):
+    key = snapshot._overrides_key(overrides)
+    assert len(key) == 16
+    assert all(c in "0123456789abcdef" for c in key)
+    # The key depends on the overrides and not the order in which they're given
+    assert snapshot._overrides_key(dict(reversed(list(overrides.items())))) == key
+    assert snapshot._overrides_key({"b": 2, **overrides}) != key
 
 
 def test_write_notebook_outputs():
-    compat_builtin = "builtins.open"
-    output_dir = "output_dir"
+    output_dir = tempfile.mkdtemp()
     result = mock.Mock(spec=constants.NotebookResultComplete)
-    result.raw_html_resources = {"outputs": {"out/put/img.png": "blah"}}
-    with mock.patch(compat_builtin) as fopen:
-        snapshot._write_notebook_outputs(result, output_dir)
-        fopen.assert_any_call("output_dir/out/put/img.png", "wb")
-        fopen().__enter__().write.assert_any_call("blah")
+    result.raw_html_resources = {
+        "outputs": {"out/put/img.png": b"blah", "out/put/img2.png": b"blah2", "out/plot.svg": "<svg></svg>"}
+    }
+    try:
+        os.makedirs(os.path.join(output_dir, "out/put"))
+        with mock.patch("notebooker.snapshot.os.makedirs") as makedirs:
+            snapshot._write_notebook_outputs(result, output_dir)
+        assert sorted(makedirs.mock_calls) == [
+            mock.call(os.path.join(output_dir, "out"), exist_ok=True),
+            mock.call(os.path.join(output_dir, "out/put"), exist_ok=True),
+        ]
+        assert _read(os.path.join(output_dir, "out/put/img.png"), "rb") == b"blah"
+        assert _read(os.path.join(output_dir, "out/put/img2.png"), "rb") == b"blah2"
+        assert _read(os.path.join(output_dir, "out/plot.svg")) == "<svg></svg>"
+    finally:
+        shutil.rmtree(output_dir)
@@ -2,7 +2,11 @@ import os
 import shutil
 import tempfile
 
+import jupytext
+import pytest
+
 from notebooker.utils.filesystem import mkdir_p
+from notebooker.utils.templates import _get_parameters_cell_idx, _get_parameters_source_fast
 from notebooker.web.utils import get_directory_structure
 
 
@@ -43,3 +47,68 @@ def test_get_directory_structure():
         assert get_directory_structure(temp_dir) == expected_structure
     finally:
         shutil.rmtree(temp_dir)
+
+
+LIGHT_JSON_TEMPLATE = """import numpy as np
+
+# + {"tags": ["parameters"]}
+n_points = 10
+start_date = "2020-01-01"  # A comment
+
+# -
+
+print(n_points)
+"""
+
+LIGHT_TEMPLATE = """import numpy as np
+
+# + tags=["parameters"]
+n_points = 10
+# -
+
+print(n_points)
+"""
+
+PERCENT_TEMPLATE = """# %%
+import numpy as np
+
+# %% tags=["parameters"]
+n_points = 10
+
+# %%
+print(n_points)
+"""
+
+
+@pytest.mark.parametrize("template", [LIGHT_JSON_TEMPLATE, LIGHT_TEMPLATE, PERCENT_TEMPLATE])
+def test_get_parameters_source_fast_matches_jupytext(template):
+    with tempfile.NamedTemporaryFile("w", suffix=".py") as f:
+        f.write(template)
+        f.flush()
+        nb = jupytext.read(f.name)
+        expected = nb["cells"][_get_parameters_cell_idx(nb)]["source"].strip()
+        assert _get_parameters_source_fast(f.name) == expected
+
+
+@pytest.mark.parametrize(
+    "template",
+    [
+        "import numpy as np\n\nn_points = 10\n",
+        '# + {"tags": ["parameters"]}\n# %time\nn_points = 10\n# -\n',
+        '# + {"tags": ["parameters"]}\nx = """\n# -\n"""\n# -\n',
+        "# %% tags=[\"parameters\"]\nx = '''\n# %%\n'''\n",
+        '# + {"tags": ["parameters"]}\nn_points = 10\n# -\nprint(n_points)\n',
+    ],
+    ids=[
+        "no_parameters_cell",
+        "magics_in_parameters_cell",
+        "light_end_marker_in_string",
+        "percent_cell_marker_in_string",
+        "code_after_end_marker",
+    ],
+)
+def test_get_parameters_source_fast_gives_up(template):
+    with tempfile.NamedTemporaryFile("w", suffix=".py") as f:
+        f.write(template)
+        f.flush()
+        assert _get_parameters_source_fast(f.name) is None
@@ -1,6 +1,7 @@
 # -*- coding: utf-8 -*-
 from __future__ import unicode_literals
 
+import mock
 import pytest
 
 from notebooker import constants
@@ -81,3 +82,17 @@ def test_json_to_python(input_json, output_python):
         assert json_to_python(input_json) is None
     else:
         assert json_to_python(input_json) == output_python
+
+
+@pytest.mark.parametrize(
+    "sep, report_name, expected_path",
+    [
+        ("/", "path/to/report", "path/to/report"),
+        ("\\", "path/to/report", "path\\to\\report"),
+        ("\\", b"path/to/report", b"path/to/report"),
+    ],
+)
+def test_convert_report_name_url_to_path(sep, report_name, expected_path):
+    # Only patch the os module as seen by notebooker.utils.web, rather than os.sep for the whole process.
+    with mock.patch("notebooker.utils.web.os", sep=sep):
+        assert web.convert_report_name_url_to_path(report_name) == expected_path